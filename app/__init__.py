@@ -1,11 +1,19 @@
 # In app/__init__.py
 
+import os
+from contextlib import contextmanager
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
 from flask_mail import Mail
 
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, init runs unguarded
+    fcntl = None
+
 # Note: The imports for 'photos' and 'configure_uploads' 
 # are REMOVED from here and moved into create_app()
 
@@ -24,40 +32,102 @@ def create_app():
     mail.init_app(app)
     
     # Import and register blueprints
-    from . import routes, models
+    from . import routes, cli, events, fragments, compression, ratelimit, profiling
     app.register_blueprint(routes.bp)
-    # Create DB tables and seed initial data in development environment
-    with app.app_context():
+    events.hub.init_app(app)
+    fragments.init_app(app)
+    compression.init_app(app)
+    ratelimit.limiter.init_app(app)
+    profiling.init_app(app)
+    cli.register_commands(app)
+    # Create DB tables and seed initial data. Production servers can turn this
+    # off (AUTO_INIT_DB = False) and run `flask init-db` once per deploy instead.
+    if app.config.get("AUTO_INIT_DB", True):
+        init_db(app)
+    
+    return app
+
+
+@contextmanager
+def _init_lock(app):
+    """Serialise init_db across worker processes that start at the same time."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(os.path.join(app.instance_path, "init_db.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def init_db(app):
+    """Create tables, seed demo data and patch older schemas. Safe to run repeatedly."""
+    with _init_lock(app), app.app_context():
+        from . import models
         db.create_all()
         try:
             models.seed_data()
         except Exception:
             pass
-        # Ensure 'order_code' column exists in Order table (for existing DBs)
+        # Ensure 'order_code' and 'status' columns exist in Order table (for existing DBs)
         try:
+            from sqlalchemy import text
             # Use PRAGMA to inspect columns in SQLite
-            res = db.engine.execute("PRAGMA table_info('order')").fetchall()
+            res = db.session.execute(text("PRAGMA table_info('order')")).fetchall()
             col_names = [r[1] for r in res]
+            if 'status' not in col_names:
+                db.session.execute(text("ALTER TABLE \"order\" ADD COLUMN status VARCHAR(20) DEFAULT 'pending'"))
+                db.session.execute(text("UPDATE \"order\" SET status = 'pending' WHERE status IS NULL"))
+                db.session.commit()
             if 'order_code' not in col_names:
                 # Add nullable column for existing DB
-                db.engine.execute('ALTER TABLE "order" ADD COLUMN order_code VARCHAR(32)')
-                # Populate codes for existing orders
-                from .models import Order
+                db.session.execute(text('ALTER TABLE "order" ADD COLUMN order_code VARCHAR(32)'))
+                # Populate codes for existing orders, a batch at a time
                 import secrets, string
 
                 def _generate_code(length=10):
                     alphabet = string.ascii_uppercase + string.digits
                     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
-                orders = Order.query.all()
-                for o in orders:
-                    o.order_code = _generate_code(10)
+                while True:
+                    ids = db.session.execute(text(
+                        'SELECT id FROM "order" WHERE order_code IS NULL LIMIT 500')).scalars().all()
+                    if not ids:
+                        break
+                    for oid in ids:
+                        db.session.execute(text('UPDATE "order" SET order_code = :code WHERE id = :id'),
+                                           {"code": _generate_code(10), "id": oid})
+                    db.session.flush()
+                # ALTER TABLE can't add UNIQUE; enforce it with an index instead
+                db.session.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_order_order_code ON "order" (order_code)'))
                 db.session.commit()
         except Exception:
             # If anything fails here, don't block app startup
-            pass
-    
-    return app
+            db.session.rollback()
+        # Ensure 'created_at' column exists in Order table (needed by the archival job)
+        try:
+            from sqlalchemy import text
+            res = db.session.execute(text("PRAGMA table_info('order')")).fetchall()
+            if 'created_at' not in [r[1] for r in res]:
+                db.session.execute(text('ALTER TABLE "order" ADD COLUMN created_at DATETIME'))
+                # Existing orders have no timestamp; start their archive clock now
+                db.session.execute(text('UPDATE "order" SET created_at = CURRENT_TIMESTAMP'))
+                db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_order_created_at ON "order" (created_at)'))
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+        # Indexes added to existing tables after they were first created
+        try:
+            from sqlalchemy import text
+            db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_order_user_id ON "order" (user_id)'))
+            db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_notification_user_id ON notification (user_id)'))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
 
 # User loader for Flask-Login
 @login_manager.user_loader
@@ -0,0 +1,107 @@
+"""
+Archival job for orders and notifications.
+
+Finished orders (confirmed or cancelled) and read notifications older than
+ARCHIVE_AFTER_DAYS are copied into the archive tables and removed from the hot
+tables, ARCHIVE_BATCH_SIZE rows per transaction so the site keeps serving
+while the job runs. Run it with `flask archive`.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert, select, delete
+
+from . import db
+from .models import (Order, OrderItem, Notification,
+                     ArchivedOrder, ArchivedOrderItem, ArchivedNotification)
+
+ARCHIVABLE_STATUSES = ('confirmed', 'cancelled')
+
+# archive column <- hot-table column; archive rows get fresh ids of their own
+_ORDER_COLS = {'original_id': 'id', 'order_code': 'order_code', 'user_id': 'user_id', 'fullname': 'fullname',
+               'email': 'email', 'address': 'address', 'total': 'total', 'status': 'status',
+               'created_at': 'created_at'}
+_NOTE_COLS = {'original_id': 'id', 'user_id': 'user_id', 'message': 'message', 'is_read': 'is_read',
+              'created_at': 'created_at'}
+
+
+def _cutoff(days):
+    if days is None:
+        days = current_app.config.get('ARCHIVE_AFTER_DAYS', 90)
+    return datetime.utcnow() - timedelta(days=days)
+
+
+def _copy(src, dst, cols, where):
+    """INSERT INTO dst (archive cols) SELECT hot cols FROM src WHERE ..."""
+    src_t, dst_t = src.__table__, dst.__table__
+    return insert(dst_t).from_select(
+        [dst_t.c[c] for c in cols],
+        select(*[src_t.c[c] for c in cols.values()]).where(where),
+    )
+
+
+def _copy_items(order_ids):
+    """Copy the items of just-archived orders, pointing them at the new archive order rows.
+
+    order_code is unique across both tables, so it links each hot order to its archive row.
+    """
+    return insert(ArchivedOrderItem).from_select(
+        ['order_id', 'original_id', 'original_order_id', 'product_id', 'name', 'price', 'quantity'],
+        select(ArchivedOrder.id, OrderItem.id, OrderItem.order_id, OrderItem.product_id,
+               OrderItem.name, OrderItem.price, OrderItem.quantity)
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(ArchivedOrder, ArchivedOrder.order_code == Order.order_code)
+        .where(OrderItem.order_id.in_(order_ids)),
+    )
+
+
+def archive_orders(days=None, batch_size=None):
+    """Move finished orders older than `days` (and their items). Returns the number moved."""
+    cutoff = _cutoff(days)
+    batch_size = batch_size or current_app.config.get('ARCHIVE_BATCH_SIZE', 500)
+    moved = 0
+    while True:
+        ids = [row[0] for row in db.session.execute(
+            select(Order.id)
+            .where(Order.status.in_(ARCHIVABLE_STATUSES), Order.created_at < cutoff)
+            .order_by(Order.id)
+            .limit(batch_size)
+        )]
+        if not ids:
+            break
+        try:
+            db.session.execute(_copy(Order, ArchivedOrder, _ORDER_COLS, Order.id.in_(ids)))
+            db.session.execute(_copy_items(ids))
+            db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(ids)))
+            db.session.execute(delete(Order).where(Order.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        moved += len(ids)
+    return moved
+
+
+def archive_notifications(days=None, batch_size=None):
+    """Move read notifications older than `days`. Returns the number moved."""
+    cutoff = _cutoff(days)
+    batch_size = batch_size or current_app.config.get('ARCHIVE_BATCH_SIZE', 500)
+    moved = 0
+    while True:
+        ids = [row[0] for row in db.session.execute(
+            select(Notification.id)
+            .where(Notification.is_read.is_(True), Notification.created_at < cutoff)
+            .order_by(Notification.id)
+            .limit(batch_size)
+        )]
+        if not ids:
+            break
+        try:
+            db.session.execute(_copy(Notification, ArchivedNotification, _NOTE_COLS, Notification.id.in_(ids)))
+            db.session.execute(delete(Notification).where(Notification.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        moved += len(ids)
+    return moved
@@ -0,0 +1,132 @@
+"""
+Username / email availability checks backed by Bloom filters.
+
+Each filter holds every registered username or email, lowercased. A
+negative answer ("definitely not present") means the name is free with no
+DB query, which covers almost every check a new user makes. A positive
+answer may be a false positive, so it falls back to an indexed lookup on
+the unique column.
+
+The filters are built from the user table on first use (streamed, not
+loaded wholesale), updated on every registration in this process and
+rebuilt every AVAILABILITY_REBUILD_INTERVAL seconds to pick up users
+created by other workers. The unique constraints remain the final guard.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from . import db
+from .models import User
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class AvailabilityIndex:
+    FIELDS = ("username", "email")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filters = None
+        self._built_at = 0.0
+        self._building = False
+        self._added_meanwhile = []
+
+    def _build(self):
+        error_rate = current_app.config.get("AVAILABILITY_ERROR_RATE", 0.01)
+        users = db.session.execute(select(func.count(User.id))).scalar()
+        # room to grow before the false-positive rate degrades
+        capacity = max(10000, users * 2)
+        filters = {field: BloomFilter(capacity, error_rate) for field in self.FIELDS}
+        rows = db.session.execute(
+            select(User.username, User.email).execution_options(yield_per=1000))
+        for username, email in rows:
+            filters["username"].add(username.lower())
+            filters["email"].add(email.lower())
+        return filters
+
+    def _stale(self):
+        if self._filters is None:
+            return True
+        if time.monotonic() - self._built_at > current_app.config.get("AVAILABILITY_REBUILD_INTERVAL", 600):
+            return True
+        return any(f.count > f.capacity for f in self._filters.values())
+
+    def _ensure_fresh(self):
+        if self._filters is None:
+            # first use: nothing to answer from yet, so concurrent checks wait for it
+            with self._lock:
+                if self._filters is None:
+                    self._filters = self._build()
+                    self._built_at = time.monotonic()
+            return
+        if not self._stale():
+            return
+        with self._lock:
+            if self._building or not self._stale():
+                return
+            self._building = True
+            self._added_meanwhile = []
+        try:
+            # stream the user table without the lock; other checks keep using the old filters
+            filters = self._build()
+            with self._lock:
+                for username, email in self._added_meanwhile:
+                    filters["username"].add(username)
+                    filters["email"].add(email)
+                self._filters = filters
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._building = False
+                self._added_meanwhile = []
+
+    def is_taken(self, field, value):
+        """True if a user already has this username/email; the DB is only asked on a filter hit."""
+        value = (value or "").strip()
+        if not value:
+            return False
+        self._ensure_fresh()
+        if value.lower() not in self._filters[field]:
+            return False
+        column = getattr(User, field)
+        return db.session.execute(select(User.id).where(column == value).limit(1)).first() is not None
+
+    def add(self, user):
+        if self._filters is None:
+            return
+        with self._lock:
+            username, email = user.username.lower(), user.email.lower()
+            self._filters["username"].add(username)
+            self._filters["email"].add(email)
+            if self._building:
+                # the rebuild may have read the user table before this user was committed
+                self._added_meanwhile.append((username, email))
+
+
+availability = AvailabilityIndex()
@@ -0,0 +1,238 @@
+"""
+`flask` CLI commands for inspecting and maintaining the app's database.
+
+Listing commands page through tables by primary key (keyset pagination)
+and print rows as they arrive. Nothing is loaded into memory wholesale, so
+they are safe to run against a large production database.
+"""
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, text
+
+from . import db
+
+
+def _page_through(stmt, id_col, page_size, after_id=None, limit=None):
+    """Yield rows of `stmt` ordered by `id_col`, fetching `page_size` at a time."""
+    last, shown = after_id or 0, 0
+    while True:
+        rows = db.session.execute(stmt.where(id_col > last).order_by(id_col).limit(page_size)).all()
+        if not rows:
+            return
+        for row in rows:
+            yield row
+            shown += 1
+            if limit and shown >= limit:
+                return
+        last = rows[-1][0]
+
+
+def _echo_rows(header, rows):
+    click.echo("\t".join(header))
+    count = 0
+    for row in rows:
+        click.echo("\t".join("" if v is None else str(v) for v in row))
+        count += 1
+    click.echo(f"-- {count} rows", err=True)
+
+
+def _paging_options(f):
+    f = click.option("--limit", type=int, default=None, help="Stop after this many rows.")(f)
+    f = click.option("--after-id", type=int, default=None, help="Start after this id (resume a previous listing).")(f)
+    f = click.option("--page-size", type=int, default=500, show_default=True, help="Rows fetched per query.")(f)
+    return f
+
+
+@click.command("archive")
+@click.option("--days", type=int, default=None, help="Archive rows older than this many days (default: ARCHIVE_AFTER_DAYS).")
+@click.option("--batch-size", type=int, default=None, help="Rows moved per transaction (default: ARCHIVE_BATCH_SIZE).")
+@with_appcontext
+def archive_command(days, batch_size):
+    """Move finished orders and read notifications into the archive tables."""
+    from .archive import archive_orders, archive_notifications
+    orders = archive_orders(days, batch_size)
+    notes = archive_notifications(days, batch_size)
+    click.echo(f"Archived {orders} orders and {notes} notifications.")
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Create tables, seed demo data and apply pending schema patches."""
+    from . import init_db
+    init_db(current_app._get_current_object())
+    click.echo("Database initialised.")
+
+
+@click.command("rebuild-recommendations")
+@with_appcontext
+def rebuild_recommendations_command():
+    """Recompute 'frequently bought together' pairs from all confirmed orders."""
+    from .recommend import rebuild
+    click.echo(f"Stored {rebuild()} product pairs.")
+
+
+# ---------- Inspection ----------
+@click.group("orders")
+def orders_cli():
+    """Inspect orders."""
+
+
+@orders_cli.command("list")
+@click.option("--status", default=None, help="Only orders with this status.")
+@click.option("--user-id", type=int, default=None, help="Only orders placed by this user.")
+@_paging_options
+@with_appcontext
+def orders_list(status, user_id, page_size, after_id, limit):
+    from .models import Order
+    cols = [Order.id, Order.order_code, Order.status, Order.user_id, Order.email, Order.total, Order.created_at]
+    stmt = select(*cols)
+    if status:
+        stmt = stmt.where(Order.status == status)
+    if user_id is not None:
+        stmt = stmt.where(Order.user_id == user_id)
+    _echo_rows([c.key for c in cols], _page_through(stmt, Order.id, page_size, after_id, limit))
+
+
+@click.group("notifications")
+def notifications_cli():
+    """Inspect notifications."""
+
+
+@notifications_cli.command("list")
+@click.option("--user-id", type=int, default=None, help="Only this user's notifications.")
+@click.option("--unread", is_flag=True, help="Only unread notifications.")
+@_paging_options
+@with_appcontext
+def notifications_list(user_id, unread, page_size, after_id, limit):
+    from .models import Notification
+    cols = [Notification.id, Notification.user_id, Notification.is_read, Notification.created_at, Notification.message]
+    stmt = select(*cols)
+    if user_id is not None:
+        stmt = stmt.where(Notification.user_id == user_id)
+    if unread:
+        stmt = stmt.where(Notification.is_read.is_(False))
+    _echo_rows([c.key for c in cols], _page_through(stmt, Notification.id, page_size, after_id, limit))
+
+
+@click.group("stock")
+def stock_cli():
+    """Inspect product stock."""
+
+
+@stock_cli.command("list")
+@click.option("--below", type=int, default=None, help="Only products with stock below this level.")
+@_paging_options
+@with_appcontext
+def stock_list(below, page_size, after_id, limit):
+    from .models import Product
+    cols = [Product.id, Product.stock, Product.category, Product.name]
+    stmt = select(*cols)
+    if below is not None:
+        stmt = stmt.where(Product.stock < below)
+    _echo_rows([c.key for c in cols], _page_through(stmt, Product.id, page_size, after_id, limit))
+
+
+# ---------- Health / maintenance ----------
+# Queries the app runs on hot paths; db-health reports whether each one can use an index.
+HOT_QUERIES = {
+    "orders by user": 'SELECT id FROM "order" WHERE user_id = 1 ORDER BY id DESC',
+    "order by code": 'SELECT id FROM "order" WHERE order_code = \'X\'',
+    "unread count": "SELECT count(*) FROM notification WHERE user_id = 1 AND is_read = 0",
+    "archive candidates": 'SELECT id FROM "order" WHERE status IN (\'confirmed\', \'cancelled\') AND created_at < \'2000-01-01\'',
+    "recommendations": "SELECT other_id FROM product_pair WHERE product_id = 1 ORDER BY count DESC LIMIT 6",
+}
+
+
+def _db_path():
+    return db.engine.url.database
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _pragma(name):
+    return db.session.execute(text(f"PRAGMA {name}")).scalar()
+
+
+@click.command("db-health")
+@with_appcontext
+def db_health_command():
+    """Report file, WAL and per-table sizes, free-page fragmentation and index use of hot queries."""
+    path = _db_path()
+    if path:
+        click.echo(f"file         {path}")
+        click.echo(f"db size      {_file_size(path):,} bytes")
+        click.echo(f"wal size     {_file_size(path + '-wal'):,} bytes")
+    page_size, page_count, free = _pragma("page_size"), _pragma("page_count"), _pragma("freelist_count")
+    click.echo(f"journal mode {_pragma('journal_mode')}")
+    click.echo(f"pages        {page_count:,} x {page_size} bytes, {free:,} free "
+               f"({100.0 * free / page_count if page_count else 0:.1f}% fragmentation)")
+
+    click.echo("\ntables and indexes:")
+    try:
+        # dbstat walks the b-trees page by page inside SQLite; nothing is pulled into Python
+        sizes = db.session.execute(text(
+            "SELECT name, SUM(pgsize), SUM(ncell) FROM dbstat GROUP BY name ORDER BY SUM(pgsize) DESC"))
+        for name, size, cells in sizes:
+            click.echo(f"  {name:<36} {size:>12,} bytes {cells:>10,} cells")
+    except Exception:
+        db.session.rollback()
+        # SQLite built without dbstat: fall back to row counts
+        tables = db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")).scalars().all()
+        for name in tables:
+            rows = db.session.execute(text(f'SELECT COUNT(*) FROM "{name}"')).scalar()
+            click.echo(f"  {name:<36} {rows:>12,} rows")
+
+    click.echo("\nhot query plans:")
+    for label, sql in HOT_QUERIES.items():
+        try:
+            plan = "; ".join(r[-1] for r in db.session.execute(text("EXPLAIN QUERY PLAN " + sql)))
+        except Exception as e:
+            db.session.rollback()
+            plan = f"error: {e}"
+        flag = "  " if "USING" in plan else "!!"
+        click.echo(f"  {flag} {label:<20} {plan}")
+
+
+@click.command("db-maintain")
+@click.option("--vacuum", is_flag=True, help="Rebuild the file to reclaim free pages (locks the DB while it runs).")
+@click.option("--analyze/--no-analyze", default=True, show_default=True, help="Refresh query planner statistics.")
+@click.option("--checkpoint/--no-checkpoint", default=True, show_default=True, help="Checkpoint and truncate the WAL.")
+@with_appcontext
+def db_maintain_command(vacuum, analyze, checkpoint):
+    """Run ANALYZE, WAL checkpoint and (optionally) VACUUM."""
+    db.session.remove()
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if analyze:
+            conn.exec_driver_sql("ANALYZE")
+            click.echo("ANALYZE done.")
+        if vacuum:
+            before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            conn.exec_driver_sql("VACUUM")
+            click.echo(f"VACUUM done ({before:,} free pages reclaimed).")
+        if checkpoint:
+            busy, log, done = conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").one()
+            if log == -1:
+                click.echo("Checkpoint skipped (database is not in WAL mode).")
+            else:
+                click.echo(f"Checkpoint {'incomplete, readers busy' if busy else 'done'} ({done}/{log} frames).")
+
+
+def register_commands(app):
+    app.cli.add_command(archive_command)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(rebuild_recommendations_command)
+    app.cli.add_command(orders_cli)
+    app.cli.add_command(notifications_cli)
+    app.cli.add_command(stock_cli)
+    app.cli.add_command(db_health_command)
+    app.cli.add_command(db_maintain_command)
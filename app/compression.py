@@ -0,0 +1,84 @@
+"""
+On-the-fly response compression.
+
+An after_request hook gzip- (or brotli-, when the optional `brotli` package
+is installed) compresses responses whose mimetype is in COMPRESS_MIMETYPES.
+Buffered responses are only compressed above COMPRESS_MIN_SIZE bytes;
+streamed responses are compressed chunk by chunk with a sync flush so
+each chunk still reaches the browser as soon as it is rendered.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    "text/html", "text/css", "text/plain", "text/xml",
+    "application/json", "application/javascript",
+)
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def _compress(data, encoding, level):
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level)
+
+
+def _compress_stream(chunks, encoding, level):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=min(level, 11))
+        for chunk in chunks:
+            if chunk:
+                yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def init_app(app):
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+    mimetypes = set(app.config.get("COMPRESS_MIMETYPES", DEFAULT_MIMETYPES))
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 500)
+    level = app.config.get("COMPRESS_LEVEL", 6)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough
+                or response.status_code < 200 or response.status_code >= 300
+                or response.mimetype not in mimetypes
+                or "Content-Encoding" in response.headers):
+            return response
+        encoding = _choose_encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.iter_encoded(), encoding, level)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(_compress(data, encoding, level))
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        return response
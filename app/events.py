@@ -0,0 +1,204 @@
+"""
+Pub/sub hub behind the /events Server-Sent Events stream.
+
+Routes publish per-user events (order status changes, new notifications)
+after they commit. Events are written to the shared live_event table, so
+every worker sees them: one poller thread per process reads new rows every
+SSE_POLL_INTERVAL seconds and hands them to the open EventSources of their
+user. Row ids only ever grow and are used as SSE ids, so a reconnecting
+browser that sends Last-Event-ID gets what it missed no matter which worker
+it lands on. Rows older than SSE_EVENT_RETENTION seconds are pruned.
+
+Each connection has a bounded buffer: a client that falls behind is
+disconnected and catches up from the table on reconnect instead of growing
+memory without limit.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from . import db
+from .models import LiveEvent
+
+
+class Event:
+    __slots__ = ("id", "name", "data")
+
+    def __init__(self, id, name, data):
+        self.id = id
+        self.name = name
+        self.data = data
+
+    def encode(self):
+        return f"id: {self.id}\nevent: {self.name}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class Subscription:
+    def __init__(self, hub, user_id, maxlen):
+        self.hub = hub
+        self.user_id = user_id
+        self.maxlen = maxlen
+        self.overflowed = False
+        self.last_id = 0
+        self._buffer = []
+        self._cond = threading.Condition(hub._lock)
+
+    def _push(self, event):
+        # caller holds hub._lock; replay and the poller may both deliver an event
+        if event.id <= self.last_id:
+            return
+        self.last_id = event.id
+        if len(self._buffer) >= self.maxlen:
+            self.overflowed = True
+        else:
+            self._buffer.append(event)
+        self._cond.notify()
+
+    def get(self, timeout):
+        """Wait up to `timeout` seconds; return pending events, [] on timeout, None once overflowed."""
+        with self._cond:
+            if not self._buffer and not self.overflowed:
+                self._cond.wait(timeout)
+            if self.overflowed:
+                return None
+            events = self._buffer
+            self._buffer = []
+            return events
+
+
+def _to_event(row):
+    return Event(row.id, row.name, json.loads(row.data))
+
+
+class EventHub:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._poller = None
+        self._wake = threading.Event()
+        self.app = None
+        self.history_size = 50
+        self.queue_size = 100
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.history_size = app.config.get("SSE_HISTORY_SIZE", 50)
+        self.queue_size = app.config.get("SSE_QUEUE_SIZE", 100)
+
+    def publish(self, user_id, name, data):
+        """Store an event for `user_id`; call after the change it describes has been committed."""
+        row = LiveEvent(user_id=user_id, name=name, data=json.dumps(data))
+        try:
+            db.session.add(row)
+            db.session.commit()
+        except Exception:
+            # the change itself is already committed; a lost live update is not worth a 500
+            db.session.rollback()
+            self.app.logger.exception("Could not publish %s event", name)
+            return None
+        self._wake.set()
+        return Event(row.id, name, data)
+
+    def subscribe(self, user_id, last_event_id=None):
+        """Register a connection; stored events after `last_event_id` are queued for replay."""
+        self._ensure_poller()
+        replay = []
+        if last_event_id is not None:
+            rows = db.session.execute(
+                select(LiveEvent)
+                .where(LiveEvent.user_id == user_id, LiveEvent.id > last_event_id)
+                .order_by(LiveEvent.id.desc())
+                .limit(self.history_size)
+            ).scalars().all()
+            replay = [_to_event(r) for r in reversed(rows)]
+        with self._lock:
+            sub = Subscription(self, user_id, self.queue_size)
+            for event in replay:
+                sub._push(event)
+            self._subscribers[user_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    # ---- poller ----
+    def _ensure_poller(self):
+        # started lazily so each forked worker gets its own thread
+        with self._lock:
+            if self._poller is None or not self._poller.is_alive():
+                start = db.session.execute(select(func.max(LiveEvent.id))).scalar() or 0
+                self._poller = threading.Thread(target=self._poll, args=(start,), daemon=True)
+                self._poller.start()
+
+    def _poll(self, last):
+        app = self.app
+        interval = app.config.get("SSE_POLL_INTERVAL", 1.0)
+        retention = app.config.get("SSE_EVENT_RETENTION", 3600)
+        next_prune = 0.0
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            with self._lock:
+                users = list(self._subscribers)
+            try:
+                with app.app_context():
+                    if users:
+                        rows = db.session.execute(
+                            select(LiveEvent).where(LiveEvent.id > last).order_by(LiveEvent.id)
+                        ).scalars().all()
+                        if rows:
+                            last = rows[-1].id
+                            self._dispatch([(r.user_id, _to_event(r)) for r in rows])
+                    else:
+                        last = db.session.execute(select(func.max(LiveEvent.id))).scalar() or last
+                    if time.monotonic() >= next_prune:
+                        cutoff = datetime.utcnow() - timedelta(seconds=retention)
+                        db.session.execute(delete(LiveEvent).where(LiveEvent.created_at < cutoff))
+                        db.session.commit()
+                        next_prune = time.monotonic() + 60
+                    db.session.remove()
+            except Exception:
+                app.logger.exception("SSE event poll failed")
+
+    def _dispatch(self, events):
+        with self._lock:
+            for user_id, event in events:
+                for sub in self._subscribers.get(user_id, ()):
+                    sub._push(event)
+
+
+hub = EventHub()
+
+
+def stream(sub, heartbeat=15, max_age=300, retry_ms=3000):
+    """Generator of SSE frames for one connection.
+
+    Sends a comment line every `heartbeat` seconds so proxies keep the
+    connection open, and ends after `max_age` seconds so long-lived streams
+    don't pin a worker thread forever; the browser reconnects on its own.
+    """
+    deadline = time.monotonic() + max_age
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        while time.monotonic() < deadline:
+            events = sub.get(timeout=heartbeat)
+            if events is None:
+                break
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                yield event.encode()
+    finally:
+        sub.hub.unsubscribe(sub)
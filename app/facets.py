@@ -0,0 +1,81 @@
+"""
+Faceted browsing for the home page: category, price bucket and in-stock.
+
+All facet counts come from one GROUP BY over (category, price bucket,
+in stock). The handful of cells it returns are then folded in Python. Each
+facet's counts honour the other active filters but not its own, so every
+link shows how many products clicking it would leave.
+"""
+from sqlalchemy import case, func
+
+from . import db
+from .models import Product
+
+# (key, label, low inclusive, high exclusive)
+PRICE_BUCKETS = [
+    ("under-25", "Under $25", None, 25),
+    ("25-50", "$25 - $50", 25, 50),
+    ("50-100", "$50 - $100", 50, 100),
+    ("100-plus", "$100 & up", 100, None),
+]
+_BUCKETS = {key: (lo, hi) for key, _, lo, hi in PRICE_BUCKETS}
+
+
+def _bucket_expr():
+    whens = []
+    for key, _, lo, hi in PRICE_BUCKETS:
+        if hi is not None:
+            whens.append((Product.price < hi, key))
+    return case(*whens, else_=PRICE_BUCKETS[-1][0])
+
+
+def parse_filters(args):
+    """Read category / price / in_stock from the query string, ignoring unknown price keys."""
+    price = args.get("price", "")
+    return {
+        "category": args.get("category", ""),
+        "price": price if price in _BUCKETS else "",
+        "in_stock": args.get("in_stock") == "1",
+    }
+
+
+def apply_filters(query, filters):
+    if filters["category"]:
+        query = query.filter(Product.category == filters["category"])
+    if filters["price"]:
+        lo, hi = _BUCKETS[filters["price"]]
+        if lo is not None:
+            query = query.filter(Product.price >= lo)
+        if hi is not None:
+            query = query.filter(Product.price < hi)
+    if filters["in_stock"]:
+        query = query.filter(Product.stock > 0)
+    return query
+
+
+def facet_counts(filters, q=""):
+    """Return {"category": [(name, n)], "price": [(key, label, n)], "in_stock": n}."""
+    bucket = _bucket_expr()
+    in_stock = case((Product.stock > 0, 1), else_=0)
+    query = db.session.query(Product.category, bucket, in_stock, func.count(Product.id))
+    if q:
+        query = query.filter(Product.name.ilike(f"%{q}%"))
+    cells = query.group_by(Product.category, bucket, in_stock).all()
+
+    categories, prices, stocked = {}, {}, 0
+    for category, price_key, has_stock, n in cells:
+        cat_ok = not filters["category"] or category == filters["category"]
+        price_ok = not filters["price"] or price_key == filters["price"]
+        stock_ok = not filters["in_stock"] or has_stock
+        if price_ok and stock_ok:
+            categories[category] = categories.get(category, 0) + n
+        if cat_ok and stock_ok:
+            prices[price_key] = prices.get(price_key, 0) + n
+        if cat_ok and price_ok and has_stock:
+            stocked += n
+
+    return {
+        "category": sorted(categories.items()),
+        "price": [(key, label, prices.get(key, 0)) for key, label, _, _ in PRICE_BUCKETS],
+        "in_stock": stocked,
+    }
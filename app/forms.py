@@ -58,4 +58,9 @@ class ContactForm(FlaskForm):
     name = StringField("Name", validators=[DataRequired()])
     email = StringField("Email", validators=[DataRequired(), Email()])
     message = TextAreaField("Message", validators=[DataRequired()])
-    submit = SubmitField("Send")
\ No newline at end of file
+    submit = SubmitField("Send")
+
+class TrackOrderForm(FlaskForm):
+    order_code = StringField("Order Code", validators=[DataRequired(), Length(max=32)])
+    email = StringField("Email", validators=[DataRequired(), Email()])
+    submit = SubmitField("Track Order")
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Template fragment caching.
+
+Adds a `{% cache key, ... %}...{% endcache %}` tag to Jinja. The rendered
+body is stored in a bounded in-process LRU under the key parts, so callers
+include whatever makes the fragment stale (e.g. a digest of the product's
+fields):
+
+    {% cache "product-card", p.card_key %} ... {% endcache %}
+
+Keys of outdated content are never looked up again and age out of the LRU,
+so nothing has to be invalidated, on this worker or any other.
+Also wires up Jinja's on-disk bytecode cache so new workers skip
+recompiling templates.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.enabled = True
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render", [nodes.Tuple(parts, "load")])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        cache = self.environment.fragment_cache
+        if not cache.enabled:
+            return caller()
+        value = cache.get(key)
+        if value is None:
+            value = caller()
+            cache.set(key, value)
+        return value
+
+
+def init_app(app):
+    env = app.jinja_env
+    env.add_extension(FragmentCacheExtension)
+    env.fragment_cache.maxsize = app.config.get("FRAGMENT_CACHE_SIZE", 1024)
+    env.fragment_cache.enabled = app.config.get("FRAGMENT_CACHE_ENABLED", True)
+
+    cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR", os.path.join(app.instance_path, "jinja_cache"))
+    if cache_dir:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        except OSError:
+            # Read-only filesystem etc.: fall back to compiling in memory
+            pass
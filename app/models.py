@@ -1,3 +1,5 @@
+import hashlib
+
 from . import db, login_manager
 from flask_login import UserMixin, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -32,15 +34,26 @@ class Product(db.Model):
     category = db.Column(db.String(80), default="General")
     stock = db.Column(db.Integer, default=100)
 
+    @property
+    def card_key(self):
+        """Digest of everything the product card shows; cache key for its rendered fragment.
+
+        Ids get reused after a delete and raw SQL updates skip ORM hooks, so the
+        key is derived from the content itself.
+        """
+        fields = (self.id, self.name, self.price, self.stock, self.description, self.image_url)
+        return hashlib.blake2b(repr(fields).encode('utf-8'), digest_size=16).hexdigest()
+
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_code = db.Column(db.String(32), unique=True, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
     fullname = db.Column(db.String(140))
     email = db.Column(db.String(140))
     address = db.Column(db.String(300))
     total = db.Column(db.Float, default=0.0)
     status = db.Column(db.String(20), default='pending')  # pending, confirmed, cancelled
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     items = db.relationship('OrderItem', backref='order', lazy=True)
 
 class OrderItem(db.Model):
@@ -54,11 +67,69 @@ class OrderItem(db.Model):
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     message = db.Column(db.String(500), nullable=False)
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+
+class ProductPair(db.Model):
+    """How many confirmed orders contained both products; stored in both directions."""
+    product_id = db.Column(db.Integer, primary_key=True)
+    other_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (db.Index('ix_product_pair_top', 'product_id', 'count'),)
+
+
+class LiveEvent(db.Model):
+    """A published /events message, shared by all workers. AUTOINCREMENT keeps ids
+    increasing even after old rows are pruned, so they double as Last-Event-ID."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    name = db.Column(db.String(40), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+# ---------- Archive tables ----------
+# Finished orders and read notifications are moved here by app.archive so the
+# hot tables above stay small. Columns mirror the originals. Archive rows get
+# their own ids: SQLite reuses the highest freed rowid in the hot tables, so the
+# original id (kept in original_id) is not unique over time.
+class ArchivedOrder(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    original_id = db.Column(db.Integer, index=True)
+    order_code = db.Column(db.String(32), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, index=True)
+    fullname = db.Column(db.String(140))
+    email = db.Column(db.String(140))
+    address = db.Column(db.String(300))
+    total = db.Column(db.Float, default=0.0)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    items = db.relationship('ArchivedOrderItem', backref='order', lazy=True)
+
+class ArchivedOrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('archived_order.id'), nullable=False, index=True)
+    original_id = db.Column(db.Integer)
+    original_order_id = db.Column(db.Integer)
+    product_id = db.Column(db.Integer)
+    name = db.Column(db.String(140))
+    price = db.Column(db.Float)
+    quantity = db.Column(db.Integer, default=1)
+
+class ArchivedNotification(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    original_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    message = db.Column(db.String(500), nullable=False)
+    is_read = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 def seed_data():
     # Called at startup; add demo admin/user/products if none exist
     if User.query.first():
@@ -0,0 +1,171 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when an admin sends `X-Profile: 1`, or at random for
+a PROFILE_SAMPLE_RATE fraction (0.0 - 1.0) of all requests. Profiling runs
+until the response body has been sent, so streamed templates are included.
+Two profilers run side by side:
+
+* cProfile, saved as a .prof pstats dump (`python -m pstats file.prof`,
+  snakeviz, ...)
+* a stack sampler every PROFILE_SAMPLE_INTERVAL seconds, saved in collapsed
+  stack format (.folded) for flamegraph.pl / speedscope
+
+Sampled requests are kept only if they took at least PROFILE_MIN_DURATION
+seconds. Dumps go to PROFILE_DIR (default instance/profiles), which works
+as a ring: only the newest PROFILE_KEEP profiles are kept. /admin/profiles
+lists them.
+"""
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app, g, request, session
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+def profile_dir(app=None):
+    app = app or current_app
+    return app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+
+
+def list_profiles():
+    """Metadata of stored profiles, newest first."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+
+def _requested_by_admin():
+    if request.headers.get("X-Profile") != "1" or not session.get("_user_id"):
+        return False
+    from flask_login import current_user
+    return current_user.is_authenticated and current_user.is_admin
+
+
+def _start():
+    app = current_app
+    forced = _requested_by_admin()
+    rate = app.config.get("PROFILE_SAMPLE_RATE", 0.0)
+    if not forced and not (rate and random.random() < rate):
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another request on this process is already being profiled
+        return
+    sampler = StackSampler(threading.get_ident(), app.config.get("PROFILE_SAMPLE_INTERVAL", 0.005))
+    sampler.start()
+    g._profile = (profiler, sampler, time.perf_counter(), forced)
+
+
+def _finish(app, profiler, sampler, started, forced, method, path, status):
+    profiler.disable()
+    sampler.stop()
+    duration = time.perf_counter() - started
+    if not forced and duration < app.config.get("PROFILE_MIN_DURATION", 0.5):
+        return
+    directory = profile_dir(app)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+        profiler.dump_stats(os.path.join(directory, name + ".prof"))
+        with open(os.path.join(directory, name + ".folded"), "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        meta = {"name": name, "method": method, "path": path, "status": status,
+                "duration_ms": round(duration * 1000, 1), "forced": forced,
+                "created_at": datetime.utcnow().isoformat(timespec="seconds")}
+        with open(os.path.join(directory, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        _trim(directory, app.config.get("PROFILE_KEEP", 50))
+    except OSError:
+        app.logger.exception("Could not write request profile")
+
+
+def _trim(directory, keep):
+    names = sorted({n.rsplit(".", 1)[0] for n in os.listdir(directory)}, reverse=True)
+    for stale in names[keep:]:
+        for ext in (".json", ".prof", ".folded"):
+            try:
+                os.remove(os.path.join(directory, stale + ext))
+            except OSError:
+                pass
+
+
+def init_app(app):
+    if not app.config.get("PROFILING_ENABLED", True):
+        return
+
+    @app.before_request
+    def start_profile():
+        _start()
+
+    @app.after_request
+    def finish_profile_when_sent(response):
+        state = g.pop("_profile", None)
+        if state is not None and response.mimetype == "text/event-stream":
+            # long-lived SSE streams would just measure idle waiting
+            state[0].disable()
+            state[1].stop()
+        elif state is not None:
+            # stop once the body has been sent so streamed pages are measured too
+            args = (current_app._get_current_object(), *state,
+                    request.method, request.full_path.rstrip("?"), response.status_code)
+            response.call_on_close(lambda: _finish(*args))
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # after_request didn't run (unhandled error): don't leave the profiler on
+        state = g.pop("_profile", None)
+        if state is not None:
+            state[0].disable()
+            state[1].stop()
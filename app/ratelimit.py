@@ -0,0 +1,165 @@
+"""
+Token-bucket rate limiting for individual routes.
+
+    @bp.route("/login", methods=["GET", "POST"])
+    @limiter.limit("login", 10, per=60, methods=["POST"])
+    def login(): ...
+
+Each (limit name, key) pair owns a bucket holding up to `burst` tokens that
+refills at `count / per` tokens a second; a request spends one token or is
+answered with 429 straight away, before the view touches the DB or hashes a
+password. Keys come from the client IP (by_ip), the logged-in user id read
+straight from the session (by_user) or a submitted form field (by_field).
+Behind a load balancer or reverse proxy, set PROXY_FIX_X_FOR to the number
+of proxies in front of the app so the client IP is taken from
+X-Forwarded-For instead of the proxy's address.
+
+Buckets live in process memory by default. Set RATELIMIT_STORAGE_PATH to a
+SQLite file to share them between gunicorn workers; if that file stays
+locked past the busy timeout the request is let through. RATELIMIT_LIMITS can
+override any limit by name, e.g. {"login": (5, 60)}, and RATELIMIT_ENABLED
+= False switches limiting off.
+"""
+import math
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, request, session
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
+def by_ip():
+    return request.remote_addr or "unknown"
+
+
+def by_user():
+    """Logged-in user id without loading the user; anonymous clients fall back to their IP."""
+    user_id = session.get("_user_id")
+    return f"user:{user_id}" if user_id else f"ip:{by_ip()}"
+
+
+def by_field(name):
+    def key():
+        value = (request.form.get(name) or "").strip().lower()
+        return f"{name}:{value}" if value else None
+    return key
+
+
+def _refill(tokens, updated, now, rate, capacity):
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class MemoryStore:
+    """Per-process buckets; the oldest keys are dropped beyond `max_keys` (a dropped bucket is simply full again)."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, rate, capacity)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class SQLiteStore:
+    """Buckets in a small SQLite file shared by every worker on the host."""
+
+    def __init__(self, path, prune_after=3600):
+        self.path = path
+        self.prune_after = prune_after
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS bucket "
+                         "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, capacity):
+        try:
+            return self._take(key, rate, capacity)
+        except sqlite3.OperationalError:
+            # "database is locked": better to skip one check than fail the request
+            current_app.logger.warning("Rate limit store unavailable, allowing request", exc_info=True)
+            return True, capacity
+
+    def _take(self, key, rate, capacity):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else _refill(row[0], row[1], now, rate, capacity)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            if random.random() < 0.001:
+                conn.execute("DELETE FROM bucket WHERE updated < ?", (now - self.prune_after,))
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.enabled = True
+        self.store = MemoryStore()
+        self.overrides = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RATELIMIT_ENABLED", True)
+        self.overrides = app.config.get("RATELIMIT_LIMITS", {})
+        path = app.config.get("RATELIMIT_STORAGE_PATH")
+        self.store = SQLiteStore(path) if path else MemoryStore()
+        proxies = app.config.get("PROXY_FIX_X_FOR", 0)
+        if proxies:
+            # trust only that many X-Forwarded-For hops; request.remote_addr becomes the client
+            app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies)
+
+    def limit(self, name, count, per, burst=None, key=by_ip, methods=None):
+        """Allow `count` requests per `per` seconds for each key, bursting up to `burst` (default `count`)."""
+        def decorator(f):
+            @wraps(f)
+            def wrapped(*args, **kwargs):
+                if self.enabled and (methods is None or request.method in methods):
+                    k = key()
+                    if k is not None:
+                        n, seconds = self.overrides.get(name, (count, per))
+                        rate = n / seconds
+                        allowed, tokens = self.store.take(f"{name}:{k}", rate, burst or n)
+                        if not allowed:
+                            retry_after = max(1, math.ceil((1 - tokens) / rate))
+                            return Response("Too many requests. Please slow down and try again shortly.\n",
+                                            429, {"Retry-After": str(retry_after)}, mimetype="text/plain")
+                return f(*args, **kwargs)
+            return wrapped
+        return decorator
+
+
+limiter = RateLimiter()
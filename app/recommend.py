@@ -0,0 +1,124 @@
+"""
+"Frequently bought together" recommendations.
+
+ProductPair holds co-occurrence counts for every pair of products that
+appeared in the same confirmed order. It is updated incrementally when an
+admin confirms an order and can be rebuilt from OrderItem with
+`flask rebuild-recommendations`. Pages read each product's top-K neighbours
+from a small in-process cache. A miss costs one indexed LIMIT query on
+ProductPair. Entries expire after RECOMMEND_CACHE_TTL seconds so other
+workers pick up new confirmations.
+"""
+import threading
+import time
+from itertools import permutations
+
+from flask import current_app
+from sqlalchemy import func, select, delete, insert, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import db
+from .models import Order, OrderItem, Product, ProductPair, ArchivedOrder, ArchivedOrderItem
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _top_k():
+    return current_app.config.get("RECOMMEND_TOP_K", 6)
+
+
+def neighbours(product_id):
+    """[(other_id, count), ...] best first, at most RECOMMEND_TOP_K long."""
+    now = time.monotonic()
+    entry = _cache.get(product_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    rows = db.session.execute(
+        select(ProductPair.other_id, ProductPair.count)
+        .where(ProductPair.product_id == product_id)
+        .order_by(ProductPair.count.desc())
+        .limit(_top_k())
+    ).all()
+    value = [(other, count) for other, count in rows]
+    with _lock:
+        _cache[product_id] = (now + current_app.config.get("RECOMMEND_CACHE_TTL", 300), value)
+    return value
+
+
+def _load_products(ids):
+    if not ids:
+        return []
+    by_id = {p.id: p for p in Product.query.filter(Product.id.in_(ids))}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def for_product(product_id):
+    """Products most often bought together with `product_id`."""
+    return _load_products([other for other, _ in neighbours(product_id)])
+
+
+def for_cart(product_ids, limit=None):
+    """Neighbours of everything in the cart, scored by summed co-occurrence, cart items excluded."""
+    limit = limit or _top_k()
+    in_cart = set(product_ids)
+    scores = {}
+    for pid in in_cart:
+        for other, count in neighbours(pid):
+            if other not in in_cart:
+                scores[other] = scores.get(other, 0) + count
+    best = sorted(scores, key=lambda pid: (-scores[pid], pid))[:limit]
+    return _load_products(best)
+
+
+def record_order(order):
+    """Count every product pair in a newly confirmed order. Caller commits."""
+    product_ids = sorted({item.product_id for item in order.items})
+    pairs = list(permutations(product_ids, 2))
+    if not pairs:
+        return
+    stmt = sqlite_insert(ProductPair).values(
+        [{"product_id": a, "other_id": b, "count": 1} for a, b in pairs])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product_id", "other_id"],
+        set_={"count": ProductPair.count + 1})
+    db.session.execute(stmt)
+    with _lock:
+        for pid in product_ids:
+            _cache.pop(pid, None)
+
+
+def remove_product(product_id):
+    """Forget a deleted product's pairs in both directions, so a product that later reuses the id
+    starts clean. Caller commits."""
+    db.session.execute(delete(ProductPair).where(
+        (ProductPair.product_id == product_id) | (ProductPair.other_id == product_id)))
+    with _lock:
+        # other products' cached neighbour lists may name it too
+        _cache.clear()
+
+
+def rebuild():
+    """Recompute ProductPair from all confirmed orders, archived ones included, for products that
+    still exist. Returns the row count."""
+    # Live and archived order ids are separate sequences, so tag each with its source
+    confirmed_items = union_all(
+        select((OrderItem.order_id * 2).label("order_key"), OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id).where(Order.status == "confirmed"),
+        select((ArchivedOrderItem.order_id * 2 + 1).label("order_key"), ArchivedOrderItem.product_id)
+        .join(ArchivedOrder, ArchivedOrder.id == ArchivedOrderItem.order_id).where(ArchivedOrder.status == "confirmed"),
+    )
+    a, b = confirmed_items.subquery("a"), confirmed_items.subquery("b")
+    existing = select(Product.id)
+    pairs = (
+        select(a.c.product_id, b.c.product_id, func.count(func.distinct(a.c.order_key)))
+        .join(b, (a.c.order_key == b.c.order_key) & (a.c.product_id != b.c.product_id))
+        .where(a.c.product_id.in_(existing), b.c.product_id.in_(existing))
+        .group_by(a.c.product_id, b.c.product_id)
+    )
+    db.session.execute(delete(ProductPair))
+    db.session.execute(insert(ProductPair).from_select(["product_id", "other_id", "count"], pairs))
+    db.session.commit()
+    with _lock:
+        _cache.clear()
+    return db.session.query(ProductPair).count()
@@ -1,11 +1,20 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session, current_app
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, session, current_app, Response,
+                   stream_template, get_flashed_messages, jsonify, send_from_directory)
 from flask_login import login_user, logout_user, login_required, current_user
 from flask_mail import Mail, Message
 from . import db
-from .models import User, Product, Order, OrderItem, Notification
-from .forms import RegisterForm, LoginForm, ProductForm, CheckoutForm, ContactForm
+from .models import User, Product, Order, OrderItem, Notification, ArchivedOrder
+from .forms import RegisterForm, LoginForm, ProductForm, CheckoutForm, ContactForm, TrackOrderForm
+from .events import hub, stream
+from .search import suggest_index
+from . import facets, recommend, profiling, tracking
+from .availability import availability
+from .ratelimit import limiter, by_ip, by_user, by_field
 from werkzeug.security import generate_password_hash
 from werkzeug.utils import secure_filename
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
 bp = Blueprint("main", __name__)
 
@@ -57,7 +66,8 @@ def generate_order_code(length=10):
     for _ in range(10):
         code = ''.join(secrets.choice(alphabet) for _ in range(length))
         # ensure uniqueness
-        if not Order.query.filter_by(order_code=code).first():
+        if not Order.query.filter_by(order_code=code).first() \
+                and not ArchivedOrder.query.filter_by(order_code=code).first():
             return code
     # fallback: longer random string
     return ''.join(secrets.choice(alphabet) for _ in range(length+4))
@@ -72,6 +82,44 @@ def log_notification_fallback(customer_email, text):
     except Exception:
         pass
 
+# ---------- Live updates (SSE) ----------
+def publish_order_status(user_id, order_id, order_code, status):
+    """Push an order status change to the customer's open /events streams"""
+    if user_id:
+        hub.publish(user_id, "order", {"id": order_id, "order_code": order_code, "status": status})
+
+def publish_notification(n):
+    """Push a freshly committed Notification to its user's open /events streams"""
+    hub.publish(n.user_id, "notification", {"id": n.id, "message": n.message})
+
+# ---------- Helper: streamed pages ----------
+def _buffered(chunks, size):
+    """Group Jinja's many tiny output events into chunks of roughly `size` characters"""
+    buf, n = [], 0
+    for piece in chunks:
+        buf.append(piece)
+        n += len(piece)
+        if n >= size:
+            yield "".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf)
+
+def stream_page(template_name, **context):
+    """Render a large page as a stream so the head and nav go out before the body is built"""
+    # The session is saved before a streamed body runs, so consume flashes up front;
+    # base.html then reads them back from the request context.
+    get_flashed_messages(with_categories=True)
+    chunks = stream_template(template_name, **context)
+    return Response(_buffered(chunks, current_app.config.get("STREAM_CHUNK_SIZE", 2048)), mimetype="text/html")
+
+@bp.app_context_processor
+def inject_unread_count():
+    """Unread notification count for the nav, as one COUNT query evaluated before rendering starts"""
+    if not current_user.is_authenticated:
+        return {"unread_count": 0}
+    return {"unread_count": Notification.query.filter_by(user_id=current_user.id, is_read=False).count()}
+
 # ---------- Helper: cart ----------
 def get_cart():
     cart = session.get("cart", {})
@@ -85,21 +133,39 @@ def save_cart(cart):
 @bp.route("/")
 def home():
     q = request.args.get("q", "")
-    cat = request.args.get("category", "")
+    filters = facets.parse_filters(request.args)
     products = Product.query
     if q:
         products = products.filter(Product.name.ilike(f"%{q}%"))
-    if cat:
-        products = products.filter_by(category=cat)
-
-    products = products.all()
-    categories = [p.category for p in Product.query.with_entities(Product.category).distinct()]
-    return render_template("home.html", products=products, categories=categories, q=q, category=cat)
+    products = facets.apply_filters(products, filters).all()
+    counts = facets.facet_counts(filters, q)
+
+    def facet_url(**changes):
+        args = {"q": q, "category": filters["category"], "price": filters["price"],
+                "in_stock": "1" if filters["in_stock"] else ""}
+        args.update(changes)
+        return url_for("main.home", **{k: v for k, v in args.items() if v})
+
+    return stream_page("home.html", products=products, facets=counts, filters=filters,
+                       facet_url=facet_url, q=q, category=filters["category"])
+
+@bp.route("/suggest")
+def suggest():
+    """Typeahead suggestions for the search box, served from the in-memory prefix index"""
+    q = request.args.get("q", "")[:100]
+    limit = min(request.args.get("limit", current_app.config.get("SUGGEST_LIMIT", 8), type=int), 20)
+    results = suggest_index.suggest(q, limit)
+    for r in results:
+        if r["type"] == "product":
+            r["url"] = url_for("main.product_detail", product_id=r["id"])
+        else:
+            r["url"] = url_for("main.home", category=r["name"])
+    return jsonify(suggestions=results)
 
 @bp.route("/product/<int:product_id>")
 def product_detail(product_id):
     p = Product.query.get_or_404(product_id)
-    return render_template("product.html", product=p)
+    return render_template("product.html", product=p, recommendations=recommend.for_product(p.id))
 
 # ---------- Auth ----------
 @bp.route("/register", methods=["GET", "POST"])
@@ -109,20 +175,44 @@ def register():
 
     form = RegisterForm()
     if form.validate_on_submit():
-        if User.query.filter_by(email=form.email.data).first():
+        # Cheap pre-checks before hashing the password; the unique constraints still have the final say
+        if availability.is_taken("email", form.email.data):
             flash("Email already registered", "warning")
             return redirect(url_for("main.register"))
+        if availability.is_taken("username", form.username.data):
+            form.username.errors.append("Username is already taken")
+            return render_template("register.html", form=form)
 
         u = User(username=form.username.data, email=form.email.data)
         u.set_password(form.password.data)
         db.session.add(u)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Registered concurrently (possibly on another worker)
+            db.session.rollback()
+            flash("That username or email was just taken. Please choose another.", "warning")
+            return render_template("register.html", form=form)
+        availability.add(u)
 
         flash("Registered! Please log in.", "success")
         return redirect(url_for("main.login"))
     return render_template("register.html", form=form)
 
+@bp.route("/register/check")
+@limiter.limit("register-check", 60, per=60, key=by_ip)
+def register_check():
+    """Live availability of ?username= and/or ?email= for the registration form"""
+    result = {}
+    for field in ("username", "email"):
+        value = request.args.get(field, "").strip()[:120]
+        if value:
+            result[field] = {"available": not availability.is_taken(field, value)}
+    return jsonify(result)
+
 @bp.route("/login", methods=["GET", "POST"])
+@limiter.limit("login", 10, per=60, key=by_ip, methods=["POST"])
+@limiter.limit("login-account", 5, per=60, key=by_field("email"), methods=["POST"])
 def login():
     if current_user.is_authenticated:
         return redirect(url_for("main.home"))
@@ -146,6 +236,7 @@ def logout():
 
 # ---------- Cart ----------
 @bp.route("/add_to_cart/<int:product_id>")
+@limiter.limit("add-to-cart", 30, per=60, key=by_user)
 def add_to_cart(product_id):
     product = Product.query.get_or_404(product_id)
     cart = get_cart()
@@ -168,7 +259,8 @@ def cart():
             items.append({"product": p, "qty": qty, "subtotal": p.price * qty}) 
             total += p.price * qty
 
-    return render_template("cart.html", items=items, total=total) 
+    recommendations = recommend.for_cart([int(pid) for pid in cart])
+    return render_template("cart.html", items=items, total=total, recommendations=recommendations)
 
 @bp.route("/cart/update", methods=["POST"])
 def cart_update():
@@ -216,6 +308,7 @@ def cart_clear():
 
 # ---------- Checkout ----------
 @bp.route("/checkout", methods=["GET", "POST"])
+@limiter.limit("checkout", 5, per=60, key=by_user, methods=["POST"])
 def checkout():
     cart = get_cart()
     if not cart:
@@ -256,6 +349,7 @@ def checkout():
                 # Add OrderItem
                 oi = OrderItem(order_id=order.id, product_id=p.id, name=p.name, price=p.price, quantity=qty)
                 db.session.add(oi)
+                suggest_index.record_sale(p.id, qty)
                 
                 # --- STOCK DECREMENT LOGIC ---
                 product_to_update = Product.query.get(p.id)
@@ -267,6 +361,10 @@ def checkout():
             # 3. Finalize
             session.pop("cart", None)
             flash("Order placed successfully! Please wait for admin confirmation.", "info")
+            if not current_user.is_authenticated:
+                # Guests can't see /orders; send them to the tracking page with their code
+                flash(f"Your order code is {order.order_code}. Use it with your email to track this order.", "info")
+                return redirect(url_for("main.track_order", code=order.order_code))
             return redirect(url_for("main.orders"))
         
         else:
@@ -283,8 +381,44 @@ def checkout():
 @bp.route("/orders")
 @login_required
 def orders():
-    user_orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.id.desc()).all()
-    return render_template("orders.html", orders=user_orders)
+    # Items are loaded up front: the streamed template renders after the DB session is closed
+    user_orders = (Order.query.filter_by(user_id=current_user.id)
+                   .options(selectinload(Order.items))
+                   .order_by(Order.id.desc()).all())
+    return stream_page("orders.html", orders=user_orders)
+
+@bp.route("/orders/archived")
+@login_required
+def archived_orders():
+    """Older finished orders moved out of the hot tables by the archival job"""
+    user_orders = (ArchivedOrder.query.filter_by(user_id=current_user.id)
+                   .order_by(ArchivedOrder.created_at.desc(), ArchivedOrder.id.desc()).all())
+    return render_template("orders.html", orders=user_orders, archived=True)
+
+# ---------- Health ----------
+@bp.route("/healthz")
+def healthz():
+    """Readiness probe for the load balancer: 200 once the database answers, 503 otherwise"""
+    try:
+        db.session.execute(text("SELECT 1"))
+    except Exception:
+        db.session.rollback()
+        return jsonify(status="unavailable"), 503
+    return jsonify(status="ok")
+
+# ---------- Order tracking (guests) ----------
+@bp.route("/track", methods=["GET", "POST"])
+@limiter.limit("track-order", 10, per=60, key=by_ip, methods=["POST"])
+def track_order():
+    form = TrackOrderForm()
+    order = None
+    if form.validate_on_submit():
+        order = tracking.lookup(form.order_code.data, form.email.data)
+        if order is None:
+            flash("No order found with that code and email.", "warning")
+    elif request.method == "GET":
+        form.order_code.data = request.args.get("code", "")
+    return render_template("track_order.html", form=form, order=order)
 
 # ---------- About / Contact ----------
 @bp.route("/about")
@@ -311,6 +445,8 @@ def admin_required(f):
     return wrapped
 
 @bp.route("/admin/login", methods=["GET", "POST"])
+@limiter.limit("admin-login", 5, per=60, key=by_ip, methods=["POST"])
+@limiter.limit("admin-login-account", 5, per=60, key=by_field("email"), methods=["POST"])
 def admin_login():
     form = LoginForm()
     if form.validate_on_submit():
@@ -335,7 +471,7 @@ def admin_dashboard():
 @admin_required
 def admin_products():
     products = Product.query.order_by(Product.id.desc()).all()
-    return render_template("admin/products.html", products=products)
+    return stream_page("admin/products.html", products=products)
 
 # --- CORRECTED: admin_product_create ---
 @bp.route("/admin/products/create", methods=["GET", "POST"])
@@ -361,6 +497,7 @@ def admin_product_create():
         )
         db.session.add(p)
         db.session.commit()
+        suggest_index.upsert_product(p)
         flash("Product created", "success")
         return redirect(url_for("main.admin_products"))
 
@@ -386,6 +523,7 @@ def admin_product_edit(product_id):
         p.category = form.category.data
         p.stock = form.stock.data
         db.session.commit()
+        suggest_index.upsert_product(p)
 
         flash("Product updated", "success")
         return redirect(url_for("main.admin_products"))
@@ -398,7 +536,9 @@ def admin_product_edit(product_id):
 def admin_product_delete(product_id):
     p = Product.query.get_or_404(product_id)
     db.session.delete(p)
+    recommend.remove_product(product_id)
     db.session.commit()
+    suggest_index.remove_product(product_id)
     flash("Product deleted", "info")
     return redirect(url_for("main.admin_products"))
 
@@ -413,6 +553,7 @@ def admin_order_details(order_id):
 @admin_required
 def admin_confirm_order(order_id):
     order = Order.query.get_or_404(order_id)
+    newly_confirmed = order.status != 'confirmed'
     
     # Update order status to confirmed
     order.status = 'confirmed'
@@ -423,7 +564,12 @@ def admin_confirm_order(order_id):
         if product:
             product.stock -= item.quantity
     
+    # Feed the "frequently bought together" pairs once per order
+    if newly_confirmed:
+        recommend.record_order(order)
     db.session.commit()
+    publish_order_status(order.user_id, order.id, order.order_code, order.status)
+    tracking.invalidate(order.order_code)
     
     # Send confirmation email to customer
     send_order_confirmed_email(order.email, order_id, order.fullname, order.total)
@@ -433,6 +579,7 @@ def admin_confirm_order(order_id):
             n = Notification(user_id=order.user_id, message=f"Your order #{order_id} has been confirmed.")
             db.session.add(n)
             db.session.commit()
+            publish_notification(n)
         else:
             # Guest order: fallback log
             log_notification_fallback(order.email, f"Order #{order_id} confirmed for {order.fullname}")
@@ -449,20 +596,26 @@ def admin_cancel_order(order_id):
     order = Order.query.get_or_404(order_id)
     customer_email = order.email
     customer_name = order.fullname
+    # Read these before the delete; the instance is gone after commit
+    user_id = order.user_id
+    order_code = order.order_code
     
     # Delete OrderItems first (foreign key constraint)
     OrderItem.query.filter_by(order_id=order_id).delete()
     db.session.delete(order)
     db.session.commit()
+    publish_order_status(user_id, order_id, order_code, 'cancelled')
+    tracking.invalidate(order_code)
     
     # Send cancellation email to customer
     send_order_cancelled_email(customer_email, order_id, customer_name)
     # Create notification for user (if registered) or fallback log
     try:
-        if order.user_id:
-            n = Notification(user_id=order.user_id, message=f"Your order #{order_id} has been cancelled by admin.")
+        if user_id:
+            n = Notification(user_id=user_id, message=f"Your order #{order_id} has been cancelled by admin.")
             db.session.add(n)
             db.session.commit()
+            publish_notification(n)
         else:
             log_notification_fallback(customer_email, f"Order #{order_id} cancelled for {customer_name}")
     except Exception:
@@ -472,6 +625,20 @@ def admin_cancel_order(order_id):
     return redirect(url_for("main.admin_dashboard"))
 
 
+# ---------- Admin Profiles ----------
+@bp.route("/admin/profiles")
+@admin_required
+def admin_profiles():
+    return render_template("admin/profiles.html", profiles=profiling.list_profiles(),
+                           sample_rate=current_app.config.get("PROFILE_SAMPLE_RATE", 0.0),
+                           min_duration=current_app.config.get("PROFILE_MIN_DURATION", 0.5))
+
+@bp.route("/admin/profiles/<name>.<any(prof, folded):ext>")
+@admin_required
+def admin_profile_download(name, ext):
+    return send_from_directory(profiling.profile_dir(), f"{name}.{ext}", as_attachment=True)
+
+
 # ---------- Notifications UI ----------
 @bp.route('/notifications')
 @login_required
@@ -497,4 +664,23 @@ def clear_all_notifications():
     Notification.query.filter_by(user_id=current_user.id).delete()
     db.session.commit()
     flash('All notifications cleared', 'success')
-    return redirect(url_for('main.notifications'))
\ No newline at end of file
+    return redirect(url_for('main.notifications'))
+
+@bp.route('/events')
+@login_required
+def events():
+    """Server-Sent Events stream of order status changes and new notifications"""
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    sub = hub.subscribe(current_user.id, last_event_id)
+    body = stream(
+        sub,
+        heartbeat=current_app.config.get('SSE_HEARTBEAT', 15),
+        max_age=current_app.config.get('SSE_MAX_AGE', 300),
+    )
+    return Response(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
@@ -0,0 +1,175 @@
+"""
+In-memory prefix index behind the /suggest typeahead endpoint.
+
+Product names (and each word inside them) and category names are kept as
+lowercase keys in one sorted list, so a prefix lookup is two bisects plus a
+scan of the matching slice; no DB access per keystroke. Products are ranked
+by popularity (units sold). The index is built lazily from the DB on first
+use and then kept current by the admin product routes and checkout.
+
+Each worker process holds its own copy, so it is also rebuilt every
+SUGGEST_REBUILD_INTERVAL seconds to pick up products and sales handled by
+other workers. That rebuild runs on a background thread; lookups keep
+using the old index until the new one is swapped in.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from flask import current_app
+from sqlalchemy import func, select, union_all
+
+from . import db
+from .models import Product, OrderItem, ArchivedOrderItem
+
+_HIGH = "\uffff"
+
+
+def _terms(name):
+    name = (name or "").lower().strip()
+    if not name:
+        return set()
+    words = name.split()
+    # the full name plus every word-suffix, so "head" matches "Bluetooth Headphones"
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    def __init__(self, max_scan=2000):
+        self.max_scan = max_scan
+        self._lock = threading.RLock()
+        self._built = False
+        self._built_at = 0.0
+        self._refreshing = False
+        self._keys = []          # sorted (term, kind, ref) tuples
+        self._products = {}      # id -> (name, category)
+        self._popularity = {}    # product id -> units sold
+        self._categories = {}    # category -> number of products in it
+
+    # ----- maintenance -----
+    def build(self):
+        """(Re)load every product and its sales count from the DB, archived orders included."""
+        items = union_all(
+            select(OrderItem.product_id, OrderItem.quantity),
+            select(ArchivedOrderItem.product_id, ArchivedOrderItem.quantity),
+        ).subquery()
+        sold = dict(db.session.execute(
+            select(items.c.product_id, func.sum(items.c.quantity)).group_by(items.c.product_id)).all())
+        rows = db.session.query(Product.id, Product.name, Product.category).all()
+        # fill a fresh index without the lock so lookups keep using the current one meanwhile
+        fresh = PrefixIndex(self.max_scan)
+        for pid, name, category in rows:
+            fresh._add(pid, name, category)
+        fresh._keys.sort()
+        popularity = {pid: qty or 0 for pid, qty in sold.items()}
+        with self._lock:
+            self._keys = fresh._keys
+            self._products = fresh._products
+            self._categories = fresh._categories
+            self._popularity = popularity
+            self._built = True
+            self._built_at = time.monotonic()
+
+    def _stale(self):
+        return time.monotonic() - self._built_at > current_app.config.get("SUGGEST_REBUILD_INTERVAL", 300)
+
+    def _refresh(self, app):
+        try:
+            with app.app_context():
+                self.build()
+                db.session.remove()
+        except Exception:
+            app.logger.exception("Suggest index rebuild failed")
+        finally:
+            self._refreshing = False
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+        elif self._stale() and not self._refreshing:
+            # stale: rebuild on a background thread and keep answering from the old index
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._refresh, args=(current_app._get_current_object(),),
+                             daemon=True).start()
+
+    def _add(self, pid, name, category, keep_sorted=False):
+        self._products[pid] = (name, category)
+        add = insort if keep_sorted else list.append
+        for term in _terms(name):
+            add(self._keys, (term, "product", pid))
+        if category:
+            count = self._categories.get(category, 0)
+            if count == 0:
+                add(self._keys, (category.lower(), "category", category))
+            self._categories[category] = count + 1
+
+    def _remove(self, pid):
+        name, category = self._products.pop(pid)
+        for term in _terms(name):
+            i = bisect_left(self._keys, (term, "product", pid))
+            if i < len(self._keys) and self._keys[i] == (term, "product", pid):
+                del self._keys[i]
+        if category:
+            count = self._categories.get(category, 0) - 1
+            if count <= 0:
+                self._categories.pop(category, None)
+                i = bisect_left(self._keys, (category.lower(), "category", category))
+                if i < len(self._keys) and self._keys[i] == (category.lower(), "category", category):
+                    del self._keys[i]
+            else:
+                self._categories[category] = count
+
+    def upsert_product(self, product):
+        """Add a new product or re-index one whose name/category changed."""
+        if not self._built:
+            return
+        with self._lock:
+            if product.id in self._products:
+                self._remove(product.id)
+            self._add(product.id, product.name, product.category, keep_sorted=True)
+
+    def remove_product(self, product_id):
+        if not self._built:
+            return
+        with self._lock:
+            if product_id in self._products:
+                self._remove(product_id)
+            self._popularity.pop(product_id, None)
+
+    def record_sale(self, product_id, quantity):
+        if not self._built:
+            return
+        with self._lock:
+            self._popularity[product_id] = self._popularity.get(product_id, 0) + quantity
+
+    # ----- lookup -----
+    def suggest(self, prefix, limit=8):
+        """Top `limit` categories and products whose name (or a word in it) starts with `prefix`."""
+        prefix = prefix.lower().strip()
+        if not prefix:
+            return []
+        self.ensure_built()
+        with self._lock:
+            lo = bisect_left(self._keys, (prefix,))
+            hi = bisect_left(self._keys, (prefix + _HIGH,), lo)
+            categories, product_ids = [], set()
+            for term, kind, ref in self._keys[lo:min(hi, lo + self.max_scan)]:
+                if kind == "category":
+                    categories.append(ref)
+                else:
+                    product_ids.add(ref)
+            top = heapq.nlargest(limit, product_ids, key=lambda pid: (self._popularity.get(pid, 0), -pid))
+            # a couple of category shortcuts first, largest categories winning
+            categories.sort(key=lambda c: -self._categories.get(c, 0))
+            results = [{"type": "category", "name": c} for c in categories[:2]]
+            results += [{"type": "product", "id": pid, "name": self._products[pid][0]} for pid in top]
+        return results[:limit]
+
+
+suggest_index = PrefixIndex()
@@ -0,0 +1,58 @@
+"""
+Order status lookup for the public /track page.
+
+Orders are found by their unique order_code (an index lookup, archived
+orders included). Only the columns the page shows are read. The email on
+the order must match as well, so a code alone reveals nothing. Results are
+kept in a small in-process cache for ORDER_TRACK_CACHE_TTL seconds, and
+confirm/cancel in this worker drop the entry right away.
+"""
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from . import db
+from .models import Order, ArchivedOrder
+
+_MISSING = object()
+_cache = {}
+_lock = threading.Lock()
+
+
+def _fetch(order_code):
+    for model in (Order, ArchivedOrder):
+        row = db.session.execute(
+            select(model.order_code, model.email, model.status, model.total, model.created_at)
+            .where(model.order_code == order_code)
+        ).first()
+        if row is not None:
+            return row._asdict()
+    return None
+
+
+def lookup(order_code, email):
+    """The order's public fields, or None when the code is unknown or the email doesn't match."""
+    order_code = (order_code or "").strip().upper()
+    email = (email or "").strip().lower()
+    if not order_code or not email:
+        return None
+    now = time.monotonic()
+    entry = _cache.get(order_code, _MISSING)
+    if entry is _MISSING or entry[0] <= now:
+        order = _fetch(order_code)
+        with _lock:
+            _cache[order_code] = (now + current_app.config.get("ORDER_TRACK_CACHE_TTL", 30), order)
+            if len(_cache) > current_app.config.get("ORDER_TRACK_CACHE_SIZE", 10000):
+                _cache.clear()
+    else:
+        order = entry[1]
+    if order is None or (order["email"] or "").strip().lower() != email:
+        return None
+    return order
+
+
+def invalidate(order_code):
+    with _lock:
+        _cache.pop(order_code, None)
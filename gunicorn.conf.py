@@ -0,0 +1,53 @@
+"""
+Gunicorn settings for production serving.
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py run:app
+
+Every setting can be overridden from the environment (WEB_CONCURRENCY,
+GUNICORN_THREADS, ...). The app is imported once in the master (preload),
+so table creation / seeding runs a single time before workers fork.
+
+Reloads:
+    kill -HUP <master>    restart workers gracefully (new config, same code)
+    kill -USR2 <master>   start a new master with new code, then
+    kill -QUIT <old>      once the new workers pass /healthz
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Preforked worker processes, each running a thread pool. Every open page of a
+# logged-in user holds one thread for its /events stream, for up to SSE_MAX_AGE
+# seconds before the browser reconnects. So the pool is sized for those mostly
+# idle streams (they wait on a condition and hold no DB connection) plus the
+# regular requests: GUNICORN_THREADS should exceed the open pages expected per
+# worker. When that number grows large, run a second instance of this config
+# that only receives /events from the proxy, so streams can never starve page
+# requests.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers now and then so slow leaks can't accumulate
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = os.environ.get("GUNICORN_ERROR_LOG", "-")
+
+
+def post_fork(server, worker):
+    # Connections opened in the master during preload must not be shared
+    # across processes; every worker starts with an empty pool.
+    from app import db
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose()
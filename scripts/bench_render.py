@@ -0,0 +1,65 @@
+"""
+Benchmark home page rendering with and without the product fragment cache.
+Renders home.html against an in-memory catalog, so the DB is not touched.
+
+    python scripts/bench_render.py [products] [iterations]
+"""
+import sys, os, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from collections import Counter
+from flask import render_template, url_for
+from app import create_app
+from app.facets import PRICE_BUCKETS
+from app.models import Product
+
+n_products = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+app = create_app()
+products = [
+    Product(id=i, name=f"Product {i}", price=i * 1.25, stock=i % 50,
+            description="A reasonably long product description used to exercise truncation. " * 2,
+            image_url="/static/uploads/speaker.jpg", category=f"Cat {i % 8}")
+    for i in range(1, n_products + 1)
+]
+
+
+def _bucket(price):
+    return next(key for key, _, lo, hi in PRICE_BUCKETS if hi is None or price < hi)
+
+
+# Same shape as app.facets.facet_counts(), computed from the in-memory catalog
+prices = Counter(_bucket(p.price) for p in products)
+facets = {
+    "category": sorted(Counter(p.category for p in products).items()),
+    "price": [(key, label, prices.get(key, 0)) for key, label, _, _ in PRICE_BUCKETS],
+    "in_stock": sum(1 for p in products if p.stock > 0),
+}
+filters = {"category": "", "price": "", "in_stock": False}
+
+
+def facet_url(**changes):
+    return url_for("main.home", **{k: v for k, v in changes.items() if v})
+
+
+def render():
+    return render_template("home.html", products=products, facets=facets, filters=filters,
+                           facet_url=facet_url, q="", category="")
+
+
+def run(label, enabled):
+    cache = app.jinja_env.fragment_cache
+    cache.enabled = enabled
+    cache.clear()
+    with app.test_request_context('/'):
+        render()  # warm-up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            render()
+        elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed / iterations * 1000:8.2f} ms/render")
+
+
+print(f"home.html, {n_products} products, {iterations} iterations")
+run("fragment cache off", False)
+run("fragment cache on", True)